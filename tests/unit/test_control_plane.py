@@ -2,14 +2,12 @@
 import os
 from pinecone import Client
 import pytest
-from time import time
+from time import time, sleep
 import numpy as np 
-from ..utils.utils import retry_assert
-from ..utils.remote_index import PodType
+from ..utils.utils import retry_assert_get
+from ..utils.remote_index import PodType, get_client
 
-env = os.getenv('PINECONE_REGION')
-key = os.getenv('PINECONE_API_KEY')
-client = Client(key, env)
+client = get_client()
 INDEX_NAME_PREFIX = 'control-plane-' + str(np.random.randint(10000))
 d = 512
 
@@ -17,31 +15,81 @@ INDEX_NAME_KEY = 'index_name'
 POD_TYPE_KEY = 'pod_type'
 
 
-@pytest.fixture(scope="module",
-                params=[
-                    {INDEX_NAME_KEY: f'{INDEX_NAME_PREFIX}-{PodType.P1}',
-                     POD_TYPE_KEY: PodType.P1}
-                ],
-                ids=lambda param: str(param[POD_TYPE_KEY]))
-def index_fixture(testrun_uid, request):
-    index_name = request.param[INDEX_NAME_KEY] + '-' + testrun_uid[:8]
-    pod_type = request.param[POD_TYPE_KEY]
-    # Note: relies on grouping strategy –-dist=loadfile to keep different xdist workers
-    # from repeating this
-    index_creation_args = {'name': index_name,
-                           'dimension': d,
-                           'pod_type': str(pod_type),
-                           'pods': 2}
-    client.create_index(**index_creation_args)
+INDEX_PARAMS = [
+    {INDEX_NAME_KEY: f'{INDEX_NAME_PREFIX}-{PodType.P1}',
+     POD_TYPE_KEY: PodType.P1}
+]
+
 
-    def remove_index():
-        if index_name in client.list_indexes():
-            client.delete_index(index_name)
+def wait_for_ready_batch(index_names, total_timeout=300):
+    """polls all given indexes in one loop until every one of them reports Ready"""
+    pending = set(index_names)
+    deadline = time() + total_timeout
+    while pending:
+        pending = {name for name in pending if client.describe_index(name).status != 'Ready'}
+        if pending and time() > deadline:
+            raise RuntimeError(f'indexes {sorted(pending)} did not get ready in {total_timeout} seconds')
+        if pending:
+            sleep(1)
+
+
+def wait_for_deleted_batch(index_names, total_timeout=300):
+    """polls list_indexes() until none of the given indexes is listed anymore"""
+    pending = set(index_names)
+    deadline = time() + total_timeout
+    while pending:
+        pending &= set(client.list_indexes())
+        if pending and time() > deadline:
+            raise RuntimeError(f'indexes {sorted(pending)} were not deleted in {total_timeout} seconds')
+        if pending:
+            sleep(1)
+
+
+@pytest.fixture(scope="module")
+def control_plane_indexes(testrun_uid, request):
+    """
+    Creates the indexes for all INDEX_PARAMS at once and yields a {pod_type: index_name} dict.
+    create_index/delete_index are called with timeout=-1 so that the control plane works on all of them
+    concurrently, and readiness/deletion is then awaited for the whole set.
+    """
+    index_names = {str(param[POD_TYPE_KEY]): param[INDEX_NAME_KEY] + '-' + testrun_uid[:8]
+                   for param in INDEX_PARAMS}
+
+    def remove_indexes():
+        existing = client.list_indexes()
+        to_delete = [name for name in index_names.values() if name in existing]
+        for name in to_delete:
+            client.delete_index(name, timeout=-1)
+        wait_for_deleted_batch(to_delete)
+
+    # attempt to remove indexes even if creation raises exception
+    request.addfinalizer(remove_indexes)
+
+    # Note: relies on grouping strategy –-dist=loadscope to keep different xdist workers
+    # from repeating this
+    for param in INDEX_PARAMS:
+        index_creation_args = {'name': index_names[str(param[POD_TYPE_KEY])],
+                               'dimension': d,
+                               'pod_type': str(param[POD_TYPE_KEY]),
+                               'pods': 2,
+                               'timeout': -1}
+        try:
+            client.create_index(**index_creation_args)
+        except ConnectionError as e:
+            # create_index connects to the new index right away, which may not be reachable before it's ready
+            if f"Failed to connect to index '{index_creation_args['name']}'" not in str(e):
+                raise
+    wait_for_ready_batch(index_names.values())
+
+    yield index_names
 
-    # attempt to remove index even if creation raises exception
-    request.addfinalizer(remove_index)
 
-    yield index_name, f"{pod_type}.x1" if pod_type.is_implicitly_x1() else str(pod_type)
+@pytest.fixture(scope="module",
+                params=INDEX_PARAMS,
+                ids=lambda param: str(param[POD_TYPE_KEY]))
+def index_fixture(control_plane_indexes, request):
+    pod_type = request.param[POD_TYPE_KEY]
+    yield control_plane_indexes[str(pod_type)], f"{pod_type}.x1" if pod_type.is_implicitly_x1() else str(pod_type)
 
 # The client interface
 def test_client_valid_params():
@@ -52,39 +100,30 @@ def test_env_vars():
     # assuming tess are run with env vars set
     pinecone = Client()
 
-@pytest.fixture(scope="function")
-def set_api_key_env_var(testrun_uid):
-    old_key = os.environ.get('PINECONE_API_KEY')
-    os.environ['PINECONE_API_KEY'] = "non-existent-key"
-    yield old_key
-    if old_key is not None:
-        os.environ['PINECONE_API_KEY'] = old_key
-
-@pytest.fixture(scope="function")
-def set_region_env_var(testrun_uid):
-    old_region = os.environ.get('PINECONE_REGION')
-    os.environ['PINECONE_REGION'] = "non-existent-region"
-    yield old_region
-    if old_region is not None:
-        os.environ['PINECONE_REGION'] = old_region
-
-def test_env_vars_missing_api_key(set_api_key_env_var):
+def test_env_vars_missing_api_key(monkeypatch):
+    monkeypatch.setenv('PINECONE_API_KEY', "non-existent-key")
     with pytest.raises(ConnectionError):
         pinecone = Client()
 
-def test_env_vars_missing_region(set_region_env_var):
+def test_env_vars_missing_region(monkeypatch):
+    monkeypatch.setenv('PINECONE_REGION', "non-existent-region")
     with pytest.raises(ConnectionError):
         pinecone = Client()
 
-def test_env_var_override(set_api_key_env_var, set_region_env_var):
+def test_env_var_override(monkeypatch):
+    old_key = os.environ.get('PINECONE_API_KEY')
+    old_region = os.environ.get('PINECONE_REGION')
+    monkeypatch.setenv('PINECONE_API_KEY', "non-existent-key")
+    monkeypatch.setenv('PINECONE_REGION', "non-existent-region")
     assert os.environ['PINECONE_API_KEY'] == "non-existent-key"
     assert os.environ['PINECONE_REGION'] == "non-existent-region"
-    pinecone = Client(api_key=set_api_key_env_var, region=set_region_env_var)
+    pinecone = Client(api_key=old_key, region=old_region)
     pinecone.list_indexes()
 
-# def test_env_var_override_region(set_region_env_var):
-#     assert os.environ['PINECONE_REGION'] == "non-existent-region"
-#     pinecone = Client(region=set_region_env_var)
+# def test_env_var_override_region(monkeypatch):
+#     old_region = os.environ.get('PINECONE_REGION')
+#     monkeypatch.setenv('PINECONE_REGION', "non-existent-region")
+#     pinecone = Client(region=old_region)
 #     pinecone.list_indexes()
 def test_client_invalid_params():
     with pytest.raises(TypeError):
@@ -170,8 +209,9 @@ def test_update(index_fixture):
     num_replicas = 2
     client.scale_index(name=index_name, replicas=num_replicas)
 
-    retry_assert(lambda:  client.describe_index(index_name).status == 'Ready')
-    meta_obj = client.describe_index(index_name)
+    meta_obj = retry_assert_get(lambda: client.describe_index(index_name),
+                                lambda res: res.status == 'Ready' and res.replicas == num_replicas,
+                                deadline_s=300, interval_s=1.0)
     assert meta_obj.replicas == 2
     assert meta_obj.pods == 4
 
@@ -187,8 +227,9 @@ def test_update(index_fixture):
     # Scale to zero
     num_replicas = 0
     client.scale_index(name=index_name, replicas=num_replicas)
-    retry_assert(lambda:  client.describe_index(index_name).status == 'Ready')
-    meta_obj = client.describe_index(index_name)
+    meta_obj = retry_assert_get(lambda: client.describe_index(index_name),
+                                lambda res: res.status == 'Ready' and res.replicas == num_replicas,
+                                deadline_s=300, interval_s=1.0)
     assert meta_obj.replicas == num_replicas
     assert meta_obj.pods == num_replicas
 
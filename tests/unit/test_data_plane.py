@@ -1,4 +1,4 @@
-import itertools
+import functools
 import os
 import sys
 import numpy as np
@@ -6,19 +6,35 @@ import pinecone as pinecone
 from pinecone import Vector,Client, PineconeOpError
 import pytest
 from loguru import logger
-import asyncio
 
-from ..utils.remote_index import RemoteIndex, PodType
-from ..utils.utils import index_fixture_factory, retry_assert
+from ..utils.remote_index import RemoteIndex, PodType, get_client
+from ..utils.utils import index_fixture_factory, retry_assert, retry_assert_get, chunked_upsert
 
 logger.remove()
 logger.add(sys.stdout, level=(os.getenv("PINECONE_LOGGING") or "INFO"))
 
 vector_dim = 512
+# constant vectors shared by tests; Vector() and the query calls copy them, so they are never mutated
+POS_VEC = np.full(vector_dim, 0.1, dtype=np.float64).tolist()
+NEG_VEC = np.full(vector_dim, -0.1, dtype=np.float64).tolist()
+POS2_VEC = np.full(vector_dim, 0.2, dtype=np.float64).tolist()
+# metadata filters shared by tests; they are only serialized by the client, never mutated
+_FILTER_COLOR_RED = {'color': 'red'}
+_FILTER_COLORS_YELLOW = {'colors': 'yellow'}
+_FILTER_GENRE_ACTION = {'genre': {'$in': ['action']}}
+_FILTER_ACTION_IN_ACTION = {'action': {'$in': ['action']}}
+_FILTER_EXISTS_FALSE_OR_GREECE = {'$or': [{'colors': {'$exists': False}}, {'country': {'$eq': 'greece'}}]}
+_FILTER_EXISTS_TRUE = {'colors': {'$exists': True}}
 env = os.getenv('PINECONE_REGION')
-api_key = os.getenv('PINECONE_API_KEY')
-client = Client(api_key,env)
 INDEX_NAME_PREFIX = 'data-plane'
+# single seeded generator for the module; get_test_data seeds its own from its arguments so it can be cached
+_rng = np.random.default_rng(seed=0xC0FFEE)
+
+
+@pytest.fixture(scope="session")
+def client():
+    return get_client()
+
 
 test_data_plane_index = index_fixture_factory(
     [
@@ -27,48 +43,77 @@ test_data_plane_index = index_fixture_factory(
     ]
 )
 
-def get_random_metadata():
-    # return a random value for metadata key 
-    # it can be either a string,float,int, bool or list of strings
-    return np.random.choice(['action', 'documentary', 'drama'], np.random.randint(1, 5),np.random.rand(),[np.random.choice(['action', 'documentary', 'drama']) for _ in range(5)])
-
-def construct_random_metadata():
-    base_dict = {
-        'some_string': np.random.choice(['action', 'documentary', 'drama']),
-        'some_int': np.random.randint(2000, 2021),
-        'some_bool' : np.random.choice([True, False]),
-        'some_float' : np.random.rand(),
-        'some_list' : [np.random.choice(['action', 'documentary', 'drama']) for _ in range(5)]
-    }
-
-    # Add some random additional keys
-    for _ in range(3):
-        base_dict[f'key_{np.random.randint(1, 100)}'] = np.random.choice(['action', 'documentary', 'drama',
-                                                                          np.random.randint(2000, 2021),
-                                                                          np.random.choice([True, False]),
-                                                                          np.random.rand()])
-    return base_dict
 
-def get_test_data(vector_count=10, no_meta_vector_count=5, dimension=vector_dim):
-    """repeatably produces same results for a given vector_count"""
+_GENRES = ('action', 'documentary', 'drama')
+CATEGORIES = np.array(_GENRES)
+
+
+def construct_random_metadata_batch(n, rng):
+    """returns n random metadata dicts, drawing each field for all of them in a single numpy call"""
+    strings = rng.choice(CATEGORIES, n).tolist()
+    ints = rng.integers(2000, 2021, n).tolist()
+    bools = rng.choice([True, False], n).tolist()
+    floats = rng.random(n).tolist()
+    lists = rng.choice(CATEGORIES, (n, 5)).tolist()
+
+    # 3 additional random keys per dict, each valued by one of: a category, an int, a bool or a float.
+    # Like a mixed-type np.random.choice, the value ends up as a string.
+    extra_keys = rng.integers(1, 100, (n, 3)).tolist()
+    candidates = np.stack([np.broadcast_to(CATEGORIES[0], (n, 3)),
+                           np.broadcast_to(CATEGORIES[1], (n, 3)),
+                           np.broadcast_to(CATEGORIES[2], (n, 3)),
+                           rng.integers(2000, 2021, (n, 3)).astype(str),
+                           rng.choice([True, False], (n, 3)).astype(str),
+                           rng.random((n, 3)).astype(str)], axis=-1)
+    choices = rng.integers(0, candidates.shape[-1], (n, 3, 1))
+    extra_values = np.take_along_axis(candidates, choices, axis=-1)[..., 0].tolist()
+
+    batch = []
+    for i in range(n):
+        base_dict = {
+            'some_string': strings[i],
+            'some_int': ints[i],
+            'some_bool': bools[i],
+            'some_float': floats[i],
+            'some_list': lists[i]
+        }
+        for key, value in zip(extra_keys[i], extra_values[i]):
+            base_dict[f'key_{key}'] = value
+        batch.append(base_dict)
+    return batch
+
+
+@functools.lru_cache(maxsize=32)
+def _get_test_data_cached(vector_count, no_meta_vector_count, dimension):
+    # seeding from the arguments makes the data a pure function of them, so it is safe to cache
+    rng = np.random.default_rng([vector_count, no_meta_vector_count, dimension])
     meta_vector_count = vector_count - no_meta_vector_count
+    # draw all values at once rather than one rand() call per vector
+    rows = rng.random((vector_count, dimension)).tolist()
 
     no_meta_vectors: list[Vector] = [
-        Vector(f'vec{i}', np.random.rand(dimension).tolist())
-        for i in range(no_meta_vector_count)
+        Vector(f'vec{i}', values)
+        for i, values in enumerate(rows[meta_vector_count:])
     ]
     meta_vectors: list[Vector] = [
-        Vector(f'mvec{i}', np.random.rand(dimension).tolist(), None, construct_random_metadata())
-        for i in range(meta_vector_count)
+        Vector(f'mvec{i}', values, None, metadata)
+        for i, (values, metadata) in enumerate(zip(rows[:meta_vector_count],
+                                                   construct_random_metadata_batch(meta_vector_count, rng)))
     ]
     assert len(meta_vectors)==meta_vector_count
     assert len(no_meta_vectors)==no_meta_vector_count
-    return meta_vectors + no_meta_vectors
+    return tuple(meta_vectors + no_meta_vectors)
+
+
+def get_test_data(vector_count=10, no_meta_vector_count=5, dimension=vector_dim):
+    """repeatably produces same results for a given vector_count"""
+    # shallow copy, so callers may reorder or extend the list without touching the cache
+    return list(_get_test_data_cached(vector_count, no_meta_vector_count, dimension))
 
 
 def get_test_data_dict(vector_count=10, no_meta_vector_count=5, dimension=vector_dim):
     return {vec.id: (vec.values, vec.metadata) for vec in
-            get_test_data(vector_count, no_meta_vector_count, dimension)}
+            _get_test_data_cached(vector_count, no_meta_vector_count, dimension)}
 
 
 def get_vector_count(index, namespace):
@@ -78,53 +123,35 @@ def get_vector_count(index, namespace):
     return stats[namespace].vector_count
 
 
-def write_test_data(index, namespace, vector_count=10, no_meta_vector_count=5, dimension=vector_dim, batch_size=300):
-    """writes vector_count vectors into index, half with metadata half without."""
+def write_test_data(index, namespace, vector_count=10, no_meta_vector_count=5, dimension=vector_dim, batch_size=300,
+                    wait=False):
+    """
+    writes vector_count vectors into index, half with metadata half without.
+    Relies on the acknowledged upserted_count unless wait is set, in which case it also waits until
+    describe_index_stats reports all vectors in namespace; tests that read the data right away need that.
+    """
     data = get_test_data(vector_count, no_meta_vector_count, dimension)
-    count_before = get_vector_count(index, namespace)
-
     upsert(index, namespace, data, batch_size)
-
-    retry_assert(lambda: len(data) == (get_vector_count(index, namespace) - count_before))
+    if wait:
+        retry_assert(lambda: get_vector_count(index, namespace) == len(data))
     data_dict = {vec.id: vec for vec in
             data}
     return data_dict
 
 
-def upsert(index, namespace, data, batch_size = -1):
-    def chunks():
-        """A helper function to break an iterable into chunks of size batch_size."""
-        it = iter(data)
-        chunk = list(itertools.islice(it, batch_size))
-        while chunk:
-            yield chunk
-            chunk = list(itertools.islice(it, batch_size))
-    total_vectors_upserted = 0
-    for chunk in chunks():
-        res = index.upsert(vectors=chunk, namespace=namespace)
-        total_vectors_upserted += res.upserted_count
+def upsert(index, namespace, data, batch_size=100):
+    """upserts data in batches of batch_size, sending all batches concurrently"""
+    if batch_size == -1:
+        # upsert everything in a single request
+        batch_size = max(len(data), 1)
+    total_vectors_upserted = chunked_upsert(index, data, namespace=namespace, batch_size=batch_size)
     assert total_vectors_upserted == len(data)
 
-async def async_upload(index, vectors, batch_size):
-    def chunker(seq, batch_size):
-        return (seq[pos:pos + batch_size] for pos in range(0, len(seq), batch_size))
-
-    async_results = [
-        index.upsert(vectors=chunk, async_req=True)
-        for chunk in chunker(vectors, batch_size=batch_size)
-    ]
-
-    total_vectors_upserted = 0
-    for task in asyncio.as_completed(async_results):
-        res = await task
-        total_vectors_upserted += res.upserted_count
-    return total_vectors_upserted
-
 
 def test_client_invalid_api_key():
     with pytest.raises(ConnectionError):
         # all our api keys have a uuid format
-        pinecone = Client(api_key='invalid_api_key')
+        Client(api_key='invalid_api_key')
 
 
 def test_summarize_no_api_key():
@@ -137,7 +164,7 @@ def test_summarize_no_api_key():
     logger.debug('got expected exception: {}', exc_info.value)
 
 
-def test_summarize_nonexistent_index():
+def test_summarize_nonexistent_index(client):
     logger.info("api key header: " + os.getenv('PINECONE_API_KEY'))
     with pytest.raises(ConnectionError) as exc_info:
         nonexistent_index = client.get_index('nonexistent-index')
@@ -193,7 +220,7 @@ def test_upsert_vectors_async(test_data_plane_index):
     index, _ = test_data_plane_index
     namespace = 'test_upsert_vectors_async'
     test_data = get_test_data(vector_count=500, no_meta_vector_count=200)
-    upserted_count = asyncio.run(async_upload(index, test_data, batch_size=100))
+    upserted_count = chunked_upsert(index, test_data, batch_size=100, namespace=namespace)
     assert upserted_count == len(test_data)
 
 
@@ -218,50 +245,52 @@ def test_fetch_vectors_no_metadata(test_data_plane_index):
     index, _ = test_data_plane_index
     namespace = 'test_fetch_vectors_no_metadata'
     vector_count = 40
-    test_data = write_test_data(index, namespace, vector_count, no_meta_vector_count=vector_count)
+    test_data = write_test_data(index, namespace, vector_count, no_meta_vector_count=vector_count, wait=True)
 
-    api_response = index.fetch(ids=list(test_data.keys()), namespace=namespace)
+    api_response = index.fetch(ids=list(test_data), namespace=namespace)
     # Assert response is not none
     assert api_response
     logger.debug('got fetch without metadata response: {}', api_response)
 
-    for test_vector in test_data.values():
-        id = test_vector.id
-        assert id in api_response
-        assert api_response.get(id).values == test_vector.values
-        assert not api_response.get(id).metadata
+    for vector_id, test_vector in test_data.items():
+        fetched_vector = api_response.get(vector_id)
+        assert fetched_vector is not None
+        assert fetched_vector.values == test_vector.values
+        assert not fetched_vector.metadata
 
 
 def test_fetch_vectors(test_data_plane_index):
     index, _ = test_data_plane_index
     namespace = 'test_fetch_vectors'
     vector_count = 40
-    test_data = write_test_data(index, namespace, vector_count)
-    api_response = index.fetch(ids=[vec.id for vec in list(test_data.values())], namespace=namespace)
+    test_data = write_test_data(index, namespace, vector_count, wait=True)
+    api_response = index.fetch(ids=list(test_data), namespace=namespace)
     logger.debug('got fetch response: {}', api_response)
 
-    for test_vector in test_data.values():
-        id = test_vector.id
-        assert id in api_response
-        assert api_response.get(id).values == test_vector.values
-        assert api_response.get(id).metadata == test_vector.metadata
-        assert api_response.get(id).id == test_vector.id
+    # pair every expected vector with its fetched counterpart up front, then compare row by row
+    items = [(vector_id, test_vector, api_response.get(vector_id)) for vector_id, test_vector in test_data.items()]
+    for vector_id, test_vector, fetched_vector in items:
+        assert fetched_vector is not None
+        assert fetched_vector.values == test_vector.values
+        assert fetched_vector.metadata == test_vector.metadata
+        assert fetched_vector.id == vector_id
 
 
 def test_fetch_vectors_mixed_metadata(test_data_plane_index):
     index, _ = test_data_plane_index
     namespace = 'test_fetch_vectors_mixed_metadata'
     vector_count = 100
-    test_data = write_test_data(index, namespace, vector_count, no_meta_vector_count=50)
+    test_data = write_test_data(index, namespace, vector_count, no_meta_vector_count=50, wait=True)
 
-    api_response = index.fetch(ids=list(test_data.keys()), namespace=namespace)
+    api_response = index.fetch(ids=list(test_data), namespace=namespace)
     logger.debug('got fetch response: {}', api_response)
 
-    for vector_id in test_data.keys():
-        assert api_response.get(vector_id)
-        assert api_response.get(vector_id).values == test_data.get(vector_id).values
+    for vector_id, test_vector in test_data.items():
+        fetched_vector = api_response.get(vector_id)
+        assert fetched_vector
+        assert fetched_vector.values == test_vector.values
         if vector_id.startswith('m'):
-            assert api_response.get(vector_id).metadata == test_data.get(vector_id).metadata
+            assert fetched_vector.metadata == test_vector.metadata
 
 
 def test_invalid_fetch_nonexistent_vectors(test_data_plane_index):
@@ -276,7 +305,7 @@ def test_invalid_fetch_nonexistent_vectors(test_data_plane_index):
 def test_invalid_fetch_nonexistent_namespace(test_data_plane_index):
     index, _ = test_data_plane_index
     api_response = index.fetch(ids=['no-such-vec1', 'no-such-vec2'], namespace='no-such-namespace')
-    assert len(api_response.keys()) == 0
+    assert len(api_response) == 0
     logger.debug('got fetch response: {}', api_response)
 
 
@@ -287,8 +316,8 @@ def test_summarize(test_data_plane_index):
     stats_before = index.describe_index_stats()
     assert stats_before.index_fullness == 0
     write_test_data(index, namespace, vector_count=vector_count, dimension=vector_dim)
-    response = index.describe_index_stats()
-    assert response.namespaces[namespace].vector_count == vector_count
+    response = retry_assert_get(index.describe_index_stats,
+                                lambda res: namespace in res.namespaces and res.namespaces[namespace].vector_count == vector_count)
     assert response.total_vector_count == stats_before.total_vector_count + vector_count
 
 
@@ -297,15 +326,15 @@ def test_summarize_with_filter(test_data_plane_index):
     namespace = 'test_describe_index_stats_with_filter'
     count_before = get_vector_count(index, namespace)
     before_total_count = index.describe_index_stats().total_vector_count
-    vectors = [Vector('1', [0.1] * vector_dim,None, {'color': 'yellow'}),
-               Vector('2', [-0.1] * vector_dim,None, {'color': 'red'}),
-               Vector('3', [0.1] * vector_dim),
-               Vector('4', [-0.1] * vector_dim,None,{'color': 'red'})]
+    vectors = [Vector('1', POS_VEC,None, {'color': 'yellow'}),
+               Vector('2', NEG_VEC,None, {'color': 'red'}),
+               Vector('3', POS_VEC),
+               Vector('4', NEG_VEC,None,{'color': 'red'})]
     upsert_response = index.upsert(vectors=vectors, namespace=namespace)
     retry_assert(lambda: len(vectors) == get_vector_count(index, namespace) - count_before)
     logger.debug('got upsert response: {}', upsert_response)
 
-    response = index.describe_index_stats(filter={'color': 'red'})
+    response = index.describe_index_stats(filter=_FILTER_COLOR_RED)
     assert response.namespaces[namespace].vector_count == 2
     assert response.total_vector_count == before_total_count + len(vectors)
 
@@ -314,9 +343,9 @@ def test_invalid_query_params(test_data_plane_index):
     index, _ = test_data_plane_index
     with pytest.raises(TypeError) as exc_info:
         api_response = index.query(top_k=4,
-                                   values=[0.1] * vector_dim,
-                                   queries=[[0.1] * vector_dim,
-                                            [0.2] * vector_dim])
+                                   values=POS_VEC,
+                                   queries=[POS_VEC,
+                                            POS2_VEC])
         logger.debug('got api response {}', api_response)
     logger.debug('got expected exception: {}', exc_info.value)
 
@@ -325,7 +354,7 @@ def test_negative_top_k(test_data_plane_index):
     index, _ = test_data_plane_index
     with pytest.raises(ValueError) as exc_info:
         api_response = index.query(top_k=-1,
-                                   values=[0.1] * vector_dim)
+                                   values=POS_VEC)
         logger.debug('got api response {}', api_response)
     logger.debug('got expected exception: {}', exc_info.value)
 
@@ -334,7 +363,7 @@ def test_large_top_k(test_data_plane_index):
     index, _ = test_data_plane_index
     with pytest.raises(PineconeOpError) as exc_info:
         api_response = index.query(top_k=12000,
-                                   values=[0.1] * vector_dim)
+                                   values=POS_VEC)
         logger.debug('got api response {}', api_response)
     logger.debug('got expected exception: {}', exc_info.value)
 
@@ -343,10 +372,10 @@ def test_query_simple(test_data_plane_index):
     index, _ = test_data_plane_index
     namespace = 'test_query_simple'
     vector_count = 10
-    write_test_data(index, namespace, vector_count)
+    write_test_data(index, namespace, vector_count, wait=True)
     # simple query - no filter, no data, no metadata
     api_response = index.query(
-        values=np.random.rand(vector_dim).tolist(),
+        values=_rng.random(vector_dim).tolist(),
         namespace=namespace,
         top_k=10,
         include_values=False,
@@ -363,10 +392,10 @@ def test_query_simple_with_values(test_data_plane_index):
     index, _ = test_data_plane_index
     namespace = 'test_query_simple_with_values'
     vector_count = 10
-    test_data = write_test_data(index, namespace, vector_count)
+    test_data = write_test_data(index, namespace, vector_count, wait=True)
     # simple query - no filter, with data, no metadata
     api_response = index.query(
-        values=np.random.rand(vector_dim).tolist(),
+        values=_rng.random(vector_dim).tolist(),
         namespace=namespace,
         top_k=10,
         include_values=True,
@@ -383,10 +412,10 @@ def test_query_simple_with_values_metadata(test_data_plane_index):
     index, _ = test_data_plane_index
     namespace = 'test_query_simple_with_values_metadata'
     vector_count = 10
-    test_data = write_test_data(index, namespace, vector_count)
+    test_data = write_test_data(index, namespace, vector_count, wait=True)
     # simple query - no filter, with data, with metadata
     api_response = index.query(
-        values=np.random.rand(vector_dim).tolist(),
+        values=_rng.random(vector_dim).tolist(),
         namespace=namespace,
         top_k=10,
         include_values=True,
@@ -407,11 +436,11 @@ def test_query_simple_with_values_mixed_metadata(test_data_plane_index):
     namespace = 'test_query_simple_with_values_mixed_metadata'
     top_k = 10
     vector_count = 10
-    test_data = write_test_data(index, namespace, vector_count, no_meta_vector_count=5)
+    test_data = write_test_data(index, namespace, vector_count, no_meta_vector_count=5, wait=True)
     # simple query - no filter, with data, with metadata
     api_response = index.query(
         values=
-            np.random.rand(vector_dim).tolist(),
+            _rng.random(vector_dim).tolist(),
         namespace=namespace,
         top_k=top_k,
         include_values=True,
@@ -422,9 +451,10 @@ def test_query_simple_with_values_mixed_metadata(test_data_plane_index):
 
     assert len(api_response) == top_k
     for match_vector in api_response:
-        assert match_vector.values == test_data.get(match_vector.id).values
-        if test_data.get(match_vector.id).values:
-            assert match_vector.metadata == test_data.get(match_vector.id).metadata
+        expected_vector = test_data.get(match_vector.id)
+        assert match_vector.values == expected_vector.values
+        if expected_vector.values:
+            assert match_vector.metadata == expected_vector.metadata
         else:
             assert not match_vector.metadata
 
@@ -433,14 +463,14 @@ def test_query_simple_with_filter_values_metadata(test_data_plane_index):
     index, _ = test_data_plane_index
     namespace = 'test_query_simple_with_filter_values_metadata'
     vector_count = 10
-    test_data = write_test_data(index, namespace, vector_count)
+    test_data = write_test_data(index, namespace, vector_count, wait=True)
     api_response = index.query(
-        values=[0.1] * vector_dim,
+        values=POS_VEC,
         namespace=namespace,
         top_k=10,
         include_values=True,
         include_metadata=True,
-        filter={'genre': {'$in': ['action']}}
+        filter=_FILTER_GENRE_ACTION
     )
     logger.debug('got query (with filter, with data, with metadata) response: {}', api_response)
     if not api_response:
@@ -455,21 +485,21 @@ def test_query_mixed_metadata_sanity(test_data_plane_index):
     index, _ = test_data_plane_index
     namespace = 'test_query_mixed_metadata'
     count_before = get_vector_count(index, namespace)
-    vectors = [Vector('1', [0.1] * vector_dim, None, {'colors': 'yellow'}),
-               Vector('2', [-0.1] * vector_dim, None, {'colors': 'red'})]
+    vectors = [Vector('1', POS_VEC, None, {'colors': 'yellow'}),
+               Vector('2', NEG_VEC, None, {'colors': 'red'})]
     upsert_response = index.upsert(vectors=vectors, namespace=namespace)
     retry_assert(lambda: len(vectors) == get_vector_count(index, namespace) - count_before)
     logger.debug('got upsert response: {}', upsert_response)
 
-    query1_response = index.query(values=[0.1] * vector_dim,
-                                  filter ={'colors': 'yellow'},
+    query1_response = index.query(values=POS_VEC,
+                                  filter=_FILTER_COLORS_YELLOW,
                                   top_k=10,
                                   include_metadata=True,
                                   namespace=namespace)
     logger.debug('got first query response: {}', query1_response)
 
-    query2_response = index.query(values=[0.1] * vector_dim,
-                                  filter = {'colors': 'yellow'},
+    query2_response = index.query(values=POS_VEC,
+                                  filter=_FILTER_COLORS_YELLOW,
                                   top_k=10,
                                   include_metadata=True,
                                   namespace=namespace)
@@ -493,12 +523,12 @@ def test_query_mixed_metadata_sanity(test_data_plane_index):
 def test_invalid_query_nonexistent_namespace(test_data_plane_index):
     index, _ = test_data_plane_index
     api_response = index.query(
-        values=[0.1] * vector_dim,
+        values=POS_VEC,
         namespace='no-such-ns',
         top_k=10,
         include_values=True,
         include_metadata=True,
-        filter={'action': {'$in': ['action']}}
+        filter=_FILTER_ACTION_IN_ACTION
     )
     logger.debug('got query (with filter, with data, with metadata) response: {}', api_response)
 
@@ -506,13 +536,13 @@ def test_query_uses_distributed_knn(test_data_plane_index):
     index, _ = test_data_plane_index
     namespace = 'test_query_with_multi_shard'
     write_test_data(index, namespace, vector_count=1000, no_meta_vector_count=1000)
-    query_response = index.query(
-        values=[0.1] * vector_dim,
+    query_response = retry_assert_get(lambda: index.query(
+        values=POS_VEC,
         namespace=namespace,
         top_k=500,
         include_values=False,
         include_metadata=False
-    )
+    ), lambda res: len(res) == 500)
     # assert that we got the same number of results as the top_k
     # regardless of the number of shards
     assert len(query_response) == 500
@@ -523,7 +553,7 @@ def test_query_by_id(test_data_plane_index):
     index, _ = test_data_plane_index
     namespace = 'test_query_by_id'
     vector_count = 10
-    test_data = write_test_data(index, namespace, vector_count)
+    test_data = write_test_data(index, namespace, vector_count, wait=True)
     api_response = index.query_by_id(
         id='vec1',
         namespace=namespace,
@@ -535,9 +565,10 @@ def test_query_by_id(test_data_plane_index):
 
     assert len(api_response) == 10
     for match_vector in api_response:
-        assert match_vector.values == test_data.get(match_vector.id).values
-        if test_data.get(match_vector.id).values:
-            assert match_vector.metadata == test_data.get(match_vector.id).metadata
+        expected_vector = test_data.get(match_vector.id)
+        assert match_vector.values == expected_vector.values
+        if expected_vector.values:
+            assert match_vector.metadata == expected_vector.metadata
         else:
             assert not match_vector.metadata
 
@@ -558,49 +589,52 @@ def test_query_by_nonexistent_id(test_data_plane_index):
     assert len(api_response) == 0
 
 
+_EXPECTED_EXISTS_FALSE_OR_GREECE = frozenset({'0', '2'})
+_EXPECTED_EXISTS_TRUE = frozenset({'0', '1'})
+
+
 def test_query_with_exists_filter(test_data_plane_index):
     index, _ = test_data_plane_index
     namespace = 'test_query_exists'
     count_before = get_vector_count(index, namespace)
-    vectors = [Vector('0', [0.1] * vector_dim, None,{'colors': True, 'country': 'greece'}),
-               Vector('1', [-0.1] * vector_dim, None,{'colors': False}),
-               Vector('2', [0.2] * vector_dim)]
+    vectors = [Vector('0', POS_VEC, None,{'colors': True, 'country': 'greece'}),
+               Vector('1', NEG_VEC, None,{'colors': False}),
+               Vector('2', POS2_VEC)]
     upsert_response = index.upsert(vectors=vectors, namespace=namespace)
     retry_assert(lambda: len(vectors) == get_vector_count(index, namespace) - count_before)
     logger.debug('got upsert response: {}', upsert_response)
 
-    response_1 = index.query(values=[0.1] * vector_dim,
-                             filter={'$or': [{'colors': {'$exists': False}}, {'country': {'$eq': 'greece'}}]},
+    response_1 = index.query(values=POS_VEC,
+                             filter=_FILTER_EXISTS_FALSE_OR_GREECE,
                              top_k=10,
                              namespace=namespace)
     logger.debug('got query response: {}', response_1)
 
-    matches_ids = {match_vector.id for match_vector in response_1}
+    matches_ids = frozenset(match_vector.id for match_vector in response_1)
     assert len(response_1) == 2
-    assert matches_ids == {'0', '2'}
+    assert matches_ids == _EXPECTED_EXISTS_FALSE_OR_GREECE
 
-    response_2 = index.query(values=[0.1] * vector_dim,
-                             filter={'colors': {'$exists': True}},
+    response_2 = index.query(values=POS_VEC,
+                             filter=_FILTER_EXISTS_TRUE,
                              top_k=10,
                              namespace=namespace)
     logger.debug('got query response: {}', response_2)
 
-    matches_ids = {match_vector.id for match_vector in response_2}
+    matches_ids = frozenset(match_vector.id for match_vector in response_2)
     assert len(response_2) == 2
-    assert matches_ids == {'0', '1'}
+    assert matches_ids == _EXPECTED_EXISTS_TRUE
 
 
 def test_delete(test_data_plane_index):
     index, _ = test_data_plane_index
     namespace = 'test_delete'
     vector_count = 10
-    test_data = write_test_data(index, namespace, vector_count)
+    test_data = write_test_data(index, namespace, vector_count, wait=True)
 
     api_response = index.fetch(ids=['mvec1', 'mvec2'], namespace=namespace)
     logger.debug('got fetch response: {}', api_response)
     assert api_response and api_response.get('mvec1').values == test_data.get('mvec1').values
 
-    vector_count = get_vector_count(index, namespace)
     api_response = index.delete(ids=['vec1', 'vec2'], namespace=namespace)
     logger.debug('got delete response: {}', api_response)
     retry_assert(lambda: get_vector_count(index, namespace) == (vector_count - 2))
@@ -611,7 +645,7 @@ def test_delete(test_data_plane_index):
 def test_delete_all(test_data_plane_index):
     index, _ = test_data_plane_index
     namespace = 'test_delete_all'
-    write_test_data(index, namespace)
+    write_test_data(index, namespace, wait=True)
     api_response = index.delete_all( namespace=namespace)
     logger.debug('got delete response: {}', api_response)
     retry_assert(lambda: namespace not in index.describe_index_stats().namespaces)
@@ -643,8 +677,7 @@ def test_update(test_data_plane_index):
     index, _ = test_data_plane_index
     namespace = 'test_update'
     vector_count = 10
-    test_data = write_test_data(index, namespace, vector_count)
-    assert get_vector_count(index, namespace) == vector_count
+    test_data = write_test_data(index, namespace, vector_count, wait=True)
 
     api_response = index.update(id='mvec1', namespace=namespace, values=test_data.get('mvec2').values)
     logger.debug('got update response: {}', api_response)
@@ -654,8 +687,7 @@ def test_update(test_data_plane_index):
 
     api_response = index.update(id='mvec2', namespace=namespace, set_metadata=test_data.get('mvec1').metadata)
     logger.debug('got update response: {}', api_response)
-    expected_metadata = test_data.get('mvec2').metadata.copy()
-    expected_metadata.update(test_data.get('mvec1').metadata.copy())
+    expected_metadata = {**test_data.get('mvec2').metadata, **test_data.get('mvec1').metadata}
     retry_assert(
         lambda: index.fetch(ids=['mvec2'], namespace=namespace).get('mvec2').metadata == expected_metadata)
     assert index.fetch(ids=['mvec2'], namespace=namespace).get('mvec2').values == test_data.get('mvec2').values
@@ -663,8 +695,7 @@ def test_update(test_data_plane_index):
     api_response = index.update(id='mvec3', namespace=namespace, values=test_data.get('mvec1').values,
                                 set_metadata=test_data.get('mvec2').metadata)
     logger.debug('got update response: {}', api_response)
-    expected_metadata = test_data.get('mvec3').metadata.copy()
-    expected_metadata.update(test_data.get('mvec2').metadata.copy())
+    expected_metadata = {**test_data.get('mvec3').metadata, **test_data.get('mvec2').metadata}
     retry_assert(
         lambda: index.fetch(ids=['mvec3'], namespace=namespace).get('mvec3').values == test_data.get('mvec1').values)
     assert index.fetch(ids=['mvec3'], namespace=namespace).get('mvec3').metadata == expected_metadata
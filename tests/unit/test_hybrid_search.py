@@ -1,18 +1,19 @@
+import functools
 import os
 import sys
 
+import numpy as np
 from loguru import logger
-from pinecone import Vector, Client, SparseValues
+from pinecone import Vector, SparseValues
 
 from ..utils.remote_index import PodType, RemoteIndex
-from ..utils.utils import index_fixture_factory, retry_assert, sparse_values, get_vector_count, approx_sparse_equals
+from ..utils.utils import index_fixture_factory, retry_assert, sparse_values, get_vector_count, approx_sparse_equals, \
+    chunked_upsert, sparse_values_batch
 
 logger.remove()
 logger.add(sys.stdout, level=(os.getenv("PINECONE_LOGGING") or "INFO"))
 
 vector_dim = 512
-env = os.getenv('PINECONE_REGION')
-api_key = os.getenv('PINECONE_API_KEY')
 
 INDEX_NAME = 'test-hybrid-search'
 
@@ -29,8 +30,13 @@ def sparse_vector(dimension=32000, nnz=120):
     return SparseValues(indices=indices, values=values)
 
 
-def get_test_data(vector_count=10, no_meta_vector_count=5, dimension=vector_dim, sparse=True):
-    """repeatably produces same results for a given vector_count"""
+def bulk_sparse_vectors(n, dimension=32000, nnz=120):
+    """generates n sparse vectors with nnz sorted, distinct indices each"""
+    return [SparseValues(indices=indices, values=values) for indices, values in sparse_values_batch(n, dimension, nnz)]
+
+
+@functools.lru_cache(maxsize=8)
+def _get_test_data_cached(vector_count, no_meta_vector_count, dimension, sparse):
     meta_vector_count = vector_count - no_meta_vector_count
     metadata_choices = [
         {'genre': 'action', 'year': 2020},
@@ -38,23 +44,37 @@ def get_test_data(vector_count=10, no_meta_vector_count=5, dimension=vector_dim,
         {'genre': 'documentary', 'year': 2005},
         {'genre': 'drama', 'year': 2011},
     ]
+    # vectors without metadata are only ever compared against themselves, so they all share the last payload;
+    # meta vectors keep distinct ones since test_update checks that swapping mvec1/mvec2 sparse values is visible
+    sparse_vectors = bulk_sparse_vectors(meta_vector_count + 1) if sparse else None
+    # row i is filled with i / 1000; both vector groups draw from the same pool of rows
+    row_count = max(meta_vector_count, no_meta_vector_count)
+    value_rows = np.broadcast_to((np.arange(row_count, dtype=np.float32) / 1000)[:, None],
+                                 (row_count, dimension)).tolist()
     no_meta_vectors: list[Vector] = [
-        Vector(id=f'vec{i}', values=[i / 1000] * dimension, sparse_values=sparse_vector() if sparse else None)
+        Vector(id=f'vec{i}', values=value_rows[i],
+               sparse_values=sparse_vectors[-1] if sparse else None)
         for i in range(no_meta_vector_count)
     ]
     meta_vectors: list[Vector] = [
-        Vector(id=f'mvec{i}', values=[i / 1000] * dimension, sparse_values=sparse_vector() if sparse else {},
+        Vector(id=f'mvec{i}', values=value_rows[i], sparse_values=sparse_vectors[i] if sparse else {},
                metadata=metadata_choices[i % len(metadata_choices)])
         for i in range(meta_vector_count)
     ]
 
-    return list(meta_vectors) + list(no_meta_vectors)
+    return tuple(meta_vectors + no_meta_vectors)
+
+
+def get_test_data(vector_count=10, no_meta_vector_count=5, dimension=vector_dim, sparse=True):
+    """repeatably produces same results for a given vector_count"""
+    # tests only read the vectors, so they can share the cached instances
+    return list(_get_test_data_cached(vector_count, no_meta_vector_count, dimension, sparse))
 
 
-def write_test_data(index, namespace, vector_count=10, no_meta_vector_count=5, dimension=vector_dim, batch_size=300):
+def write_test_data(index, namespace, vector_count=10, no_meta_vector_count=5, dimension=vector_dim, batch_size=100):
     """writes vector_count vectors into index, half with metadata half without."""
     data = get_test_data(vector_count, no_meta_vector_count, dimension)
-    index.upsert(vectors=data, namespace=namespace)
+    chunked_upsert(index, data, namespace=namespace, batch_size=batch_size)
     return {vector.id: vector for vector in data}
 
 
@@ -2,7 +2,6 @@ import dataclasses
 import os
 import sys
 import uuid
-from itertools import cycle
 from typing import Any
 
 import numpy as np
@@ -11,7 +10,7 @@ from loguru import logger
 
 from pinecone import Vector, SparseValues
 from ..utils.remote_index import RemoteIndex, PodType
-from ..utils.utils import retry_assert, index_fixture_factory
+from ..utils.utils import retry_assert, index_fixture_factory, chunked_upsert
 
 logger.remove()
 logger.add(sys.stdout, level=(os.getenv("PINECONE_LOGGING") or "INFO"))
@@ -19,6 +18,10 @@ logger.add(sys.stdout, level=(os.getenv("PINECONE_LOGGING") or "INFO"))
 d = 128
 n = 100
 
+rng = np.random.default_rng(0)
+
+WEATHER_VOCAB = ('sunny', 'rain', 'cloudy', 'snowy')
+
 INDEX_NAME_PREFIX = 'test-metadata'
 MAPPING_INDEX_NAME_PREFIX = 'test-mapping'
 
@@ -38,8 +41,11 @@ test_metadata_index_with_mapping = index_fixture_factory(
 )
 
 
-@dataclasses.dataclass
+# dataclass(slots=True) needs Python 3.10, so the slots are spelled out
+@dataclasses.dataclass(frozen=True)
 class RunData:
+    __slots__ = ('ids', 'vectors', 'metadata', 'query_vector')
+
     ids: Any
     vectors: Any
     metadata: Any
@@ -48,28 +54,27 @@ class RunData:
 
 def insert_test_data(index, _n, _d, namespace=''):
     ids = [str(i) for i in range(_n)]
-    vectors = [np.random.rand(_d).astype(np.float32).tolist() for _ in range(_n)]
-    weather_vocab = ['sunny', 'rain', 'cloudy', 'snowy']
-    loop = cycle(weather_vocab)
-    metadata = [{"value": i, 'weather': next(loop), "bool_field": i % 2 == 0} for i in range(_n)]
-    index.upsert(
-        vectors=[
-            Vector(id=ids[i], values=vectors[i], metadata=metadata[i])
-            for i in range(_n)
-        ],
+    # draws float32 directly instead of generating float64 and casting
+    vectors = rng.random((_n, _d), dtype=np.float32).tolist()
+    metadata = [{"value": i, 'weather': WEATHER_VOCAB[i % len(WEATHER_VOCAB)], "bool_field": i % 2 == 0}
+                for i in range(_n)]
+    chunked_upsert(
+        index,
+        [Vector(id=ids[i], values=vectors[i], metadata=metadata[i]) for i in range(_n)],
         namespace=namespace
     )
-    retry_assert(lambda: index.describe_index_stats().namespaces.get(namespace).vector_count == _n, max_tries=10)
+    # stats on a freshly created index lag behind, so this wait gets a longer budget than the default
+    retry_assert(lambda: index.describe_index_stats().namespaces.get(namespace).vector_count == _n, deadline_s=255)
 
     return ids, vectors, metadata
 
 
 @pytest.fixture(scope="module")
 def test_data(test_metadata_index):
-    # Note: relies on grouping strategy –-dist=loadfile to keep different xdist workers
+    # Note: relies on grouping strategy --dist=loadscope to keep different xdist workers
     # from running different tests below with different data/metadata
     index, _ = test_metadata_index
-    query_vector = np.random.rand(d).astype(np.float32).tolist()
+    query_vector = rng.random(d, dtype=np.float32).tolist()
     ids, vectors, metadata = insert_test_data(index, n, d)
     yield RunData(ids=ids, vectors=vectors, metadata=metadata, query_vector=query_vector)
 
@@ -77,21 +82,29 @@ def test_data(test_metadata_index):
 @pytest.fixture(scope="module")
 def test_data_for_mapping(test_metadata_index_with_mapping):
     index = test_metadata_index_with_mapping[0]
-    query_vector = np.random.rand(d).astype(np.float32).tolist()
+    query_vector = rng.random(d, dtype=np.float32).tolist()
     ids, vectors, metadata = insert_test_data(index, n, d)
     yield RunData(ids=ids, vectors=vectors, metadata=metadata, query_vector=query_vector)
 
 
-def get_query_results(index, vector, filter):
+def get_query_results(index, vector, filter, namespace=''):
     return index.query(
         values=vector,
         filter=filter,
+        namespace=namespace,
         top_k=10,
         include_values=True,
         include_metadata=True
     )
 
 
+def metadata_columns(matches):
+    """returns the 'value' (nan where missing) and 'weather' metadata of all matches as arrays"""
+    values = np.fromiter((match.metadata.get('value', np.nan) for match in matches), dtype=np.float64)
+    weather = np.array([match.metadata.get('weather') for match in matches], dtype=object)
+    return values, weather
+
+
 def test_fetch(test_metadata_index, test_data):
     index, _ = test_metadata_index
     ids = test_data.ids
@@ -110,17 +123,16 @@ def test_delete_eq(test_metadata_index):
     matches = [i for i in range(_n) if metadata[i]['weather'] == first_md]
 
     fetch_response = index.fetch(ids=ids, namespace=namespace)
-    fetched_vecs = list(fetch_response.values())
-    assert len(fetched_vecs) == len(ids)
+    assert len(fetch_response) == len(ids)
     assert all(fetch_response[ids[i]].metadata['weather'] == first_md for i in matches)
 
     index.delete_by_metadata(namespace=namespace, filter={'weather': first_md})
     retry_assert(
         lambda: index.describe_index_stats().namespaces[namespace].vector_count == len(ids) - len(matches))
 
-    fetch_response = index.fetch(ids=ids, namespace=namespace)
-    assert len(fetch_response.values()) == len(ids) - len(matches)
-    assert all(vec.metadata.get('weather') != first_md for vec in fetch_response.values())
+    remaining = index.fetch(ids=ids, namespace=namespace).values()
+    assert len(remaining) == len(ids) - len(matches)
+    assert not any(vec.metadata.get('weather') == first_md for vec in remaining)
 
 
 def test_gt(test_metadata_index, test_data):
@@ -128,10 +140,9 @@ def test_gt(test_metadata_index, test_data):
     query_vector = test_data.query_vector
     gt_filter = {"value": {"$gt": 10}}
     query_response = get_query_results(index, query_vector, gt_filter)
-    result = query_response
-    for match in result:
-        assert 'value' in match.metadata
-        assert match.metadata['value'] > 10
+    # a missing value is nan, which fails the comparison
+    values, _ = metadata_columns(query_response)
+    assert (values > 10).all()
 
 
 def test_lt(test_metadata_index, test_data):
@@ -139,9 +150,8 @@ def test_lt(test_metadata_index, test_data):
     query_vector = test_data.query_vector
     lt_filter = {"value": {"$lt": 10}}
     query_response = get_query_results(index, query_vector, lt_filter)
-    result = query_response
-    for match in result:
-        assert match.metadata['value'] < 10
+    values, _ = metadata_columns(query_response)
+    assert (values < 10).all()
 
 
 def test_eq(test_metadata_index, test_data):
@@ -149,9 +159,8 @@ def test_eq(test_metadata_index, test_data):
     query_vector = test_data.query_vector
     eq_filter = {"value": {"$eq": 25}}
     query_response = get_query_results(index, query_vector, eq_filter)
-    result = query_response
-    for match in result:
-        assert match.metadata['value'] == 25
+    values, _ = metadata_columns(query_response)
+    assert (values == 25).all()
 
 
 def test_boolean_eq(test_metadata_index, test_data):
@@ -178,9 +187,8 @@ def test_in(test_metadata_index, test_data):
     query_vector = test_data.query_vector
     in_filter = {"weather": {"$in": ['snowy', 'sunny']}}
     query_response = get_query_results(index, query_vector, in_filter)
-    for match in query_response:
-        metadata_value = match.metadata['weather']
-        assert metadata_value in ['snowy', 'sunny']
+    _, weather = metadata_columns(query_response)
+    assert np.isin(weather, ['snowy', 'sunny']).all()
 
 
 def test_nin(test_metadata_index, test_data):
@@ -189,9 +197,8 @@ def test_nin(test_metadata_index, test_data):
     nin_vals = ['snowy', 'rainy']
     nin_filter = {"weather": {"$nin": nin_vals}}
     query_response = get_query_results(index, query_vector, nin_filter)
-    for match in query_response:
-        metadata_value = match.metadata['value']
-        assert metadata_value not in nin_vals
+    _, weather = metadata_columns(query_response)
+    assert not np.isin(weather, nin_vals).any()
 
 
 def test_compound_ne_and_lte(test_metadata_index, test_data):
@@ -199,9 +206,8 @@ def test_compound_ne_and_lte(test_metadata_index, test_data):
     query_vector = test_data.query_vector
     cmp_filter = {"$and": [{"weather": {"$ne": "sunny"}}, {"value": {"$lte": 2}}]}
     query_response = get_query_results(index, query_vector, cmp_filter)
-    for match in query_response:
-        assert 'sunny' != match.metadata["weather"]
-        assert match.metadata["value"] <= 2
+    values, weather = metadata_columns(query_response)
+    assert ((weather != 'sunny') & (values <= 2)).all()
 
 
 def test_compound_eq_or_gte(test_metadata_index, test_data):
@@ -210,42 +216,44 @@ def test_compound_eq_or_gte(test_metadata_index, test_data):
     cmp_filter = {"$or": [{"weather": {"$eq": "snowy"}}, {"value": {"$gte": 5}}]}
     # cmp_filter = {"$or": [{"weather": {"$eq": "snowy"}}, {"value": {"gte": 5}}]}
     query_response = get_query_results(index, query_vector, cmp_filter)
-    for match in query_response:
-        w = match.metadata["weather"]
-        v = match.metadata["value"]
-        assert w == "snowy" or v >= 5
+    values, weather = metadata_columns(query_response)
+    assert ((weather == 'snowy') | (values >= 5)).all()
 
 
 def test_update_md(test_metadata_index):
     index, _ = test_metadata_index
+    # own namespace, so the shared data the filter tests read is never modified
+    namespace = 'test-update-md'
     vector_id = 'vec-update'
-    values = np.random.rand(d).astype(np.float32).tolist()
+    values = rng.random(d, dtype=np.float32).tolist()
     # first write
     old_md = {'value': 11, 'weather': 'chilly'}
-    index.upsert(vectors=[Vector(id=vector_id, values=values, metadata=old_md)])
-    retry_assert(lambda: list(index.fetch(ids=[vector_id]).values())[0].metadata == old_md)
+    index.upsert(vectors=[Vector(id=vector_id, values=values, metadata=old_md)], namespace=namespace)
+    retry_assert(lambda: index.fetch(ids=[vector_id], namespace=namespace)[vector_id].metadata == old_md)
 
     # second write
     new_md = {'value': 12, 'weather': 'sunny'}
-    index.upsert(vectors=[Vector(vector_id, values=values, metadata=new_md)])
-    retry_assert(lambda: list(index.fetch(ids=[vector_id]).values())[0].metadata == new_md)
+    index.upsert(vectors=[Vector(vector_id, values=values, metadata=new_md)], namespace=namespace)
+    retry_assert(lambda: index.fetch(ids=[vector_id], namespace=namespace)[vector_id].metadata == new_md)
 
 
 def test_multiple_values(test_metadata_index, test_data):
     index, _ = test_metadata_index
-    ids = test_data.ids
-    vectors = test_data.vectors
     query_vector = test_data.query_vector
+    # overwriting ids[0] in the default namespace would change what test_fetch and the filter tests see
+    namespace = 'test-multiple-values'
+    # decoys, so the filter has to pick the one vector out of n
+    ids, vectors, _ = insert_test_data(index, n, d, namespace=namespace)
     # multiple values
     in_vals = ['snowy', 'rainy', 'chilly']
     unique_value = 812312
     md = {'value': unique_value, 'weather': in_vals}
-    index.upsert(vectors=[Vector(id=ids[0], values=vectors[0], metadata=md)])
-    retry_assert(lambda: list(index.fetch(ids=[ids[0]]).values())[0].metadata == md)
+    index.upsert(vectors=[Vector(id=ids[0], values=vectors[0], metadata=md)], namespace=namespace)
+    retry_assert(lambda: index.fetch(ids=[ids[0]], namespace=namespace)[ids[0]].metadata == md)
 
     for val in in_vals:
         eq_filter = {'value': unique_value, 'weather': val}
-        query_response = get_query_results(index, query_vector, eq_filter)
+        query_response = get_query_results(index, query_vector, eq_filter, namespace=namespace)
         matches = query_response
         assert len(matches) == 1
         assert matches[0].metadata['value'] == unique_value
@@ -1,18 +1,19 @@
-from copy import deepcopy
+import random
 
 import numpy as np
 import pytest
-from pinecone import Client, Vector, SparseValues
-import os
+from pinecone import Vector, SparseValues
 from ..utils.remote_index import RemoteIndex, PodType
 from ..utils.utils import index_fixture_factory, retry_assert
 
 vector_dim = 512
-env = os.getenv('PINECONE_REGION')
-api_key = os.getenv('PINECONE_API_KEY')
-client = Client(api_key,env)
 INDEX_NAME_PREFIX = 'upsert-format'
 
+# seeded so failures reproduce; Generator.choice(replace=False) only does O(k) work when picking k of vector_dim indices
+_rng = np.random.default_rng(0)
+# same for the scalar metadata draws, which stay on the stdlib generator to avoid numpy's per-call dispatch overhead
+_random = random.Random(0)
+
 test_data_plane_index = index_fixture_factory(
     [
         (RemoteIndex(pods=2, index_name=f'{INDEX_NAME_PREFIX}-{PodType.P1}',
@@ -25,28 +26,38 @@ def assert_sparse_vectors(sparse_vec_1:SparseValues,sparse_vec_2:dict):
     assert sparse_vec_1.values == sparse_vec_2['values']
 
 
+_GENRES = ('action', 'documentary', 'drama')
+
+
 def get_random_metadata():
     return {
-        'some_string': np.random.choice(['action', 'documentary', 'drama']),
-        'some_int': np.random.randint(2000, 2021),
-        'some_bool' : np.random.choice([True, False]),
-        'some_float' : np.random.rand(),
-        'some_list' : [np.random.choice(['action', 'documentary', 'drama']) for _ in range(5)]
+        'some_string': _random.choice(_GENRES),
+        'some_int': _random.randint(2000, 2020),
+        'some_bool' : _random.choice((True, False)),
+        'some_float' : _random.random(),
+        'some_list' : [_random.choice(_GENRES) for _ in range(5)]
     }
 
 def get_random_vector():
-    return np.random.rand(vector_dim).astype(np.float32).tolist()
+    return _rng.random(vector_dim, dtype=np.float32).tolist()
 
 def get_random_sparse_vector():
-    indices = np.random.choice(vector_dim, 10, replace=False).astype(np.int32).tolist()
-    values = np.random.rand(10).astype(np.float32).tolist()
+    indices = _rng.choice(vector_dim, 10, replace=False, shuffle=False).astype(np.int32).tolist()
+    values = _rng.random(10, dtype=np.float32).tolist()
     return SparseValues(indices=indices, values=values)
 
 def get_random_sparse_dict():
-    indices = np.random.choice(vector_dim, 10, replace=False).astype(np.int32).tolist()
-    values = np.random.rand(10).astype(np.float32).tolist()
+    indices = _rng.choice(vector_dim, 10, replace=False, shuffle=False).astype(np.int32).tolist()
+    values = _rng.random(10, dtype=np.float32).tolist()
     return {'indices': indices, 'values': values}
 
+@pytest.fixture(scope="module")
+def canonical_full_dict():
+    """a valid upsert dict shared by the negative-type cases, which only ever override a single key"""
+    return {'id': 'vec1', 'values': get_random_vector(),
+            'sparse_values': get_random_sparse_dict(),
+            'metadata': get_random_metadata()}
+
 def sparese_dict_to_vec(sparse_vec):
     return SparseValues(indices=sparse_vec['indices'], values=sparse_vec['values'])
     
@@ -167,14 +178,9 @@ def test_upsert_dict_negative(test_data_plane_index):
     ("sparse_values", 'cat'),
     ("sparse_values", []),
 ])
-def test_upsert_dict_negative_types(test_data_plane_index, key, new_val):
+def test_upsert_dict_negative_types(test_data_plane_index, canonical_full_dict, key, new_val):
     index, _ = test_data_plane_index
-    full_dict1 = {'id': 'vec1', 'values': get_random_vector(),
-                    'sparse_values': get_random_sparse_dict(),
-                    'metadata': get_random_metadata()}
-
-    dict1 = deepcopy(full_dict1)
-    dict1[key] = new_val
+    dict1 = {**canonical_full_dict, key: new_val}
     with pytest.raises(ValueError) as e:
         index.upsert([dict1])
     assert key in str(e.value)
@@ -185,15 +191,9 @@ def test_upsert_dict_negative_types(test_data_plane_index, key, new_val):
     ("values", ['1', '4.4']),
     ("values", 0.5),
 ])
-def test_upsert_dict_negative_types_sparse(test_data_plane_index, key, new_val):
+def test_upsert_dict_negative_types_sparse(test_data_plane_index, canonical_full_dict, key, new_val):
     index, _ = test_data_plane_index
-
-    full_dict1 = {'id': 'vec1', 'values': get_random_vector(),
-                    'sparse_values': get_random_sparse_dict(),
-                    'metadata': get_random_metadata()}
-
-    dict1 = deepcopy(full_dict1)
-    dict1['sparse_values'][key] = new_val
+    dict1 = {**canonical_full_dict, 'sparse_values': {**canonical_full_dict['sparse_values'], key: new_val}}
     # TODO: Lenght mismatch between indices and values should be done on client or server?
     with pytest.raises((Exception,ValueError)) as e:
         index.upsert([dict1])
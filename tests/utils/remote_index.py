@@ -3,11 +3,25 @@ from loguru import logger
 import os
 from enum import Enum
 import pinecone as pinecone
+from pinecone import PineconeOpError
 
 from urllib3.exceptions import MaxRetryError
 
 QUOTA = 2
 
+_CLIENT_SINGLETON = None
+
+
+def get_client():
+    """
+    Returns a pinecone.Client shared by all RemoteIndex instances, created on first use
+    """
+    global _CLIENT_SINGLETON
+    if _CLIENT_SINGLETON is None:
+        _CLIENT_SINGLETON = pinecone.Client(os.getenv('PINECONE_API_KEY'), os.getenv('PINECONE_REGION'))
+    return _CLIENT_SINGLETON
+
+
 class PodType(Enum):
     """
     Enum for pod types
@@ -33,9 +47,7 @@ class RemoteIndex:
     index = None
 
     def __init__(self, pods=1, index_name=None, dimension=512, pod_type="p1", metadata_config=None,
-                 _openapi_client_config=None, source_collection='',metric='cosine'):
-        self.env = os.getenv('PINECONE_ENVIRONMENT')
-        self.key = os.getenv('PINECONE_API_KEY')
+                 _openapi_client_config=None, source_collection='',metric='cosine', client=None):
         self.pod_type = pod_type
         self.pods = pods
         self.index_name = index_name if index_name else 'sdk-citest-{0}'.format(pod_type)
@@ -43,36 +55,70 @@ class RemoteIndex:
         self.metadata_config = metadata_config
         self.source_collection = source_collection
         self.metric = metric
-        self.client = pinecone.Client(self.key, self.env)
+        # tests that need an isolated client can pass one explicitly
+        self.client = client if client is not None else get_client()
+        self.deleted = False
 
     def __enter__(self):
-        if self.index_name not in self.client.list_indexes():
-            index_creation_args = {'name': self.index_name,
-                                   'dimension': self.dimension,
-                                   'pod_type': str(self.pod_type),
-                                   'pods': self.pods,
-                                   'metadata_config': self.metadata_config,
-                                   'source_collection': self.source_collection,
-                                   'metric': self.metric}
+        index_creation_args = {'name': self.index_name,
+                               'dimension': self.dimension,
+                               'pod_type': str(self.pod_type),
+                               'pods': self.pods,
+                               'metadata_config': self.metadata_config,
+                               'source_collection': self.source_collection,
+                               'metric': self.metric}
+        # the index usually doesn't exist yet, so create directly and tolerate a conflict
+        try:
             self.client.create_index(**index_creation_args)
+        except PineconeOpError as e:
+            if 'error code 409' not in str(e):
+                raise
+            self._check_existing_matches()
+            logger.info('index {} already exists, reusing it', self.index_name)
+            # create_index waits for readiness, but an index someone else created may still be initializing
+            self.wait_for_ready()
+        self.deleted = False
 
         self.index = self.client.get_index(self.index_name)
         return self.index
 
-    @staticmethod
-    def wait_for_ready(index):
+    def _check_existing_matches(self):
+        """
+        Makes sure an index left over under the same name can stand in for the one this RemoteIndex would create
+        """
+        description = self.client.describe_index(self.index_name)
+        pod_type = str(self.pod_type)
+        if '.' not in pod_type:
+            pod_type += '.x1'
+        if (description.dimension != self.dimension or description.pod_type != pod_type
+                or description.metric != self.metric):
+            raise RuntimeError(f'index {self.index_name} already exists with dimension={description.dimension}, '
+                               f'pod_type={description.pod_type}, metric={description.metric}; expected '
+                               f'dimension={self.dimension}, pod_type={pod_type}, metric={self.metric}')
+
+    def wait_for_ready(self):
         logger.info('waiting until index gets ready...')
         max_attempts = 30
+        # probe before sleeping, then back off so a ready index returns after a single round-trip
+        delay = 0.1
         for i in range(max_attempts):
             try:
-                time.sleep(1)
-                index.describe_index_stats()
-                break
+                # the control-plane status avoids the per-shard fan-out of describe_index_stats
+                if self.client.describe_index(self.index_name).status == 'Ready':
+                    return
             except (Exception, MaxRetryError):
                 if i + 1 == max_attempts:
                     logger.info("Index didn't get ready in time. Raising error...")
                     raise
+            if i + 1 < max_attempts:
+                time.sleep(delay)
+                delay = min(delay * 1.5, 2.0)
+        logger.info("Index didn't get ready in time. Raising error...")
+        raise RuntimeError(f'index {self.index_name} did not get ready after {max_attempts} attempts')
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         print('deleting index')
+        # wait for the deletion: the next module on this worker must not create its index while this one
+        # still counts against the project quota
         self.client.delete_index(self.index_name)
+        self.deleted = True
@@ -1,21 +1,25 @@
+import asyncio
 import os
 import time
 
 from loguru import logger
 import pinecone
-from pinecone import Client
 import pytest
-import random
+from pinecone import PineconeOpError
 from .remote_index import RemoteIndex
-from _pytest.python_api import approx
 import numpy as np
 
+# seeded per xdist worker (gw0, gw1, ...; 0 without xdist) so generated test data is reproducible
+_rng = np.random.default_rng(int(os.getenv('PYTEST_XDIST_WORKER', 'gw0')[2:] or 0))
+
 
 def index_fixture_factory(remote_indices: [(RemoteIndex, str)]):
     """
     Creates and returns a pytest fixture for creating/tearing down indexes to test against.
     - adds the xdist testrun_uid to the index name unless include_random_suffix is set False
     - fixture yields a pinecone.Index object
+    - the fixture is module-scoped and the name suffix is shared by all xdist workers, so the suite must run with
+      --dist=loadscope (as the Makefile and tox.ini do) to keep every test of a module, and thus the index, on one worker
     """
 
     @pytest.fixture(scope="module", params=[remote_index[0] for remote_index in remote_indices],
@@ -24,11 +28,17 @@ def index_fixture_factory(remote_indices: [(RemoteIndex, str)]):
         request.param.index_name = request.param.index_name + '-' + testrun_uid[:8]
 
         def remove_index():
-            env = os.getenv('PINECONE_ENVIRONMENT')
-            api_key = os.getenv('PINECONE_API_KEY')
-            client = Client(api_key, env)
-            if request.param.index_name in client.list_indexes():
+            if request.param.deleted:
+                # RemoteIndex.__exit__ already deleted it
+                return
+            # the client the index was created with; get_client()'s shared instance unless one was passed in
+            client = request.param.client
+            # creation may have failed before the index existed; a 404 is cheaper than listing all indexes first
+            try:
                 client.delete_index(request.param.index_name)
+            except PineconeOpError as e:
+                if 'error code 404' not in str(e):
+                    raise
 
         # attempt to remove index even if creation raises exception
         request.addfinalizer(remove_index)
@@ -40,28 +50,61 @@ def index_fixture_factory(remote_indices: [(RemoteIndex, str)]):
     return index_fixture
 
 
-def retry_assert(fun, max_tries=5):
-    wait_time = 0.5
-    for i in range(max_tries):
+def retry_assert(fun, deadline_s=60.0, interval_s=0.1):
+    retry_assert_get(fun, lambda result: result, deadline_s=deadline_s, interval_s=interval_s)
+
+
+def retry_assert_get(fun, predicate, deadline_s=60.0, interval_s=0.1):
+    """
+    Like retry_assert, but returns the last result of fun() once predicate(result) holds.
+    Polls every interval_s seconds; the last failure is raised once deadline_s seconds have passed.
+    """
+    deadline = time.monotonic() + deadline_s
+    while True:
         try:
-            assert fun()
-            return
-        except Exception as e:
-            if i == max_tries - 1:
+            result = fun()
+            assert predicate(result)
+            return result
+        except Exception:
+            if time.monotonic() + interval_s > deadline:
                 raise
-            time.sleep(wait_time)
-            wait_time = wait_time * 2
+            time.sleep(interval_s)
 
 def sparse_values(dimension=32000, nnz=120):
-    indices = []
-    values = []
-    threshold = nnz / dimension
-    for i in range(dimension):
-        key = random.uniform(0, 1)
-        if key < threshold:
-            indices.append(i)
-            values.append(random.uniform(0, 1))
-    return indices, values
+    """
+    Returns nnz sorted, distinct random indices below dimension and their random values
+    """
+    # for nnz << dimension Generator.choice samples without replacement in O(nnz), without materializing the range
+    indices = np.sort(_rng.choice(dimension, size=nnz, replace=False))
+    values = _rng.random(nnz)
+    return indices.tolist(), values.tolist()
+
+
+def sparse_values_batch(n, dimension=32000, nnz=120):
+    """
+    Returns n (indices, values) pairs like sparse_values, drawing all rows at once
+    """
+    indices = np.sort(_rng.integers(0, dimension, size=(n, nnz)), axis=1)
+    # rows that drew an index twice are resampled on their own; for nnz << dimension that's a small fraction
+    for row in np.flatnonzero((np.diff(indices, axis=1) == 0).any(axis=1)):
+        indices[row] = np.sort(_rng.choice(dimension, size=nnz, replace=False))
+    values = _rng.random((n, nnz))
+    return list(zip(indices.tolist(), values.tolist()))
+
+
+def chunked_upsert(index, vectors, namespace='', batch_size=100):
+    """
+    Upserts vectors in batches of batch_size, sending all batches concurrently.
+    Returns the total upserted count.
+    """
+    async def upload():
+        results = await asyncio.gather(*[
+            index.upsert(vectors=vectors[pos:pos + batch_size], namespace=namespace, async_req=True)
+            for pos in range(0, len(vectors), batch_size)
+        ])
+        return sum(res.upserted_count for res in results)
+
+    return asyncio.run(upload())
 
 
 def get_vector_count(index, namespace):
@@ -71,7 +114,12 @@ def get_vector_count(index, namespace):
     return stats[namespace].vector_count
 
 
-def approx_sparse_equals(sv1, sv2):
+def approx_sparse_equals(sv1, sv2, rtol=1e-6, atol=1e-12):
     if sv1 is None and sv2 is None:
         return True
-    return sv1.indices == sv2.indices and sv1.values == approx(sv2.values)
\ No newline at end of file
+    if sv1 is None or sv2 is None:
+        return False
+    if len(sv1.indices) != len(sv2.indices):
+        return False
+    # defaults match pytest.approx's tolerances, checked in one vectorized call
+    return np.array_equal(sv1.indices, sv2.indices) and np.allclose(sv1.values, sv2.values, rtol=rtol, atol=atol)